@@ -3,68 +3,103 @@
 Parse Criterion benchmark results and generate a nicely formatted summary table.
 """
 
+import bisect
+import functools
 import json
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import date
 from uuid import uuid4
 
+try:
+    import orjson
 
-def parse_criterion_results(criterion_dir: Path) -> Dict:
-    """Parse Criterion JSON results."""
-    results = {}
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    _json_loads = json.loads
 
-    # Find all benchmark results
-    for bench_dir in criterion_dir.iterdir():
-        if not bench_dir.is_dir():
-            continue
 
-        bench_name = bench_dir.name
+def _load_one(candidate: Tuple[str, str, str]) -> Optional[Tuple[str, str, float]]:
+    """Read one estimates.json and return (bench, param, mean_ns), or None."""
+    bench_name, param_name, estimates_file = candidate
 
-        # Look for parameter subdirectories (10, 100, 1000)
-        for param_dir in bench_dir.iterdir():
-            if not param_dir.is_dir():
-                continue
+    try:
+        with open(estimates_file, "rb") as f:
+            data = _json_loads(f.read())
 
-            # Try to read estimates.json
-            estimates_file = param_dir / "new" / "estimates.json"
-            if not estimates_file.exists():
-                continue
+        # Get mean time in nanoseconds
+        return bench_name, param_name, data["mean"]["point_estimate"]
 
-            try:
-                with open(estimates_file) as f:
-                    data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
 
-                # Get mean time in nanoseconds
-                mean_ns = data["mean"]["point_estimate"]
 
-                if bench_name not in results:
-                    results[bench_name] = {}
+def parse_criterion_results(criterion_dir: str) -> Dict:
+    """Parse Criterion JSON results, keeping paths as plain strings throughout."""
+    results = {}
+    candidates = []
 
-                results[bench_name][param_dir.name] = mean_ns
+    # Find all benchmark results
+    with os.scandir(criterion_dir) as it:
+        for bench_dir in it:
+            if not bench_dir.is_dir(follow_symlinks=False):
+                continue
 
-            except (json.JSONDecodeError, KeyError):
+            bench_name = bench_dir.name
+
+            # Look for parameter subdirectories (10, 100, 1000)
+            with os.scandir(bench_dir.path) as it2:
+                for param_dir in it2:
+                    if not param_dir.is_dir(follow_symlinks=False):
+                        continue
+                    # Skip non-parameter entries such as Criterion's report/
+                    if not param_dir.name.isdigit():
+                        continue
+
+                    estimates_file = os.path.join(
+                        param_dir.path, "new", "estimates.json"
+                    )
+                    candidates.append((bench_name, param_dir.name, estimates_file))
+
+    # Overlap the file reads; results are collected here on the main thread
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for loaded in pool.map(_load_one, candidates):
+            if loaded is None:
                 continue
 
+            bench_name, param_name, mean_ns = loaded
+
+            if bench_name not in results:
+                results[bench_name] = {}
+
+            results[bench_name][param_name] = mean_ns
+
     return results
 
 
+# Upper bounds (exclusive) for each display unit, and the matching
+# (divisor, unit, precision) used to render a time in that unit
+_TIME_THRESHOLDS = [1_000, 1_000_000, 1_000_000_000]
+_TIME_UNITS = [
+    (1, "ns", 0),
+    (1_000, "µs", 2),
+    (1_000_000, "ms", 2),
+    (1_000_000_000, "s", 2),
+]
+
+
+@functools.lru_cache(maxsize=1024)
 def format_time(ns: float) -> str:
     """Format time in human-readable format with consistent width."""
-    if ns < 1000:  # Less than 1 microsecond
-        return f"{ns:.0f} ns"
-    elif ns < 1_000_000:  # Less than 1 millisecond
-        us = ns / 1000
-        return f"{us:.2f} µs"
-    elif ns < 1_000_000_000:  # Less than 1 second
-        ms = ns / 1_000_000
-        return f"{ms:.2f} ms"
-    else:
-        s = ns / 1_000_000_000
-        return f"{s:.2f} s"
+    divisor, unit, precision = _TIME_UNITS[bisect.bisect_right(_TIME_THRESHOLDS, ns)]
+    return f"{ns / divisor:.{precision}f} {unit}"
 
 
+@functools.lru_cache(maxsize=1024)
 def format_benchmark_name(name: str) -> str:
     """Format benchmark name for display."""
     # Replace underscores with spaces
@@ -86,20 +121,94 @@ def format_benchmark_name(name: str) -> str:
     return display.title()
 
 
-def build_aligned_table(results: Dict) -> str:
-    """Build results as a nicely aligned markdown table and return it as a string."""
+def _append_row(rows: List[List[str]], col_widths: List[int], row: List[str]):
+    """Append a table row and widen col_widths to fit its cells."""
+    rows.append(row)
+    for i, cell in enumerate(row):
+        if len(cell) > col_widths[i]:
+            col_widths[i] = len(cell)
+
+
+def _left_aligned_format(col_widths: List[int]) -> str:
+    """Return a format string laying out a left-aligned markdown table row."""
+    return "| " + " | ".join(f"{{:<{w}}}" for w in col_widths) + " |"
+
+
+@dataclass
+class Prepared:
+    """Benchmark results digested once in main() and shared by every builder."""
+
+    results: Dict
+    # Every parameter seen across all benchmarks, sorted numerically
+    all_params: List[str]
+    # Whether both the git baseline and cached helix runs are present
+    has_comparison: bool
+    # (param, git_time, helix_first_time, helix_cached_time) per git param
+    comparisons: List[Tuple[str, float, Optional[float], Optional[float]]]
+    # git / helix cached ratios, for params where both were measured
+    speedups: List[float]
+    avg_query: Optional[float]
+    avg_load: Optional[float]
+
+
+def _average(values: Dict) -> Optional[float]:
+    """Return the mean of a benchmark's values, or None if it has none."""
+    if not values:
+        return None
+    return sum(values.values()) / len(values)
 
-    # Get all unique parameters (10, 100, 1000) sorted
+
+def prepare_results(results: Dict) -> Prepared:
+    """Sort and cross-reference the parsed results once for all builders."""
+
+    # Parameters are validated as numeric in parse_criterion_results
     all_params = sorted(
         set(
             param
             for bench_results in results.values()
             for param in bench_results.keys()
         ),
-        key=lambda x: int(x) if x.isdigit() else 0,
+        key=int,
     )
 
-    # Prepare all rows
+    git_baseline = results.get("git_status_baseline", {})
+    helix_cached = results.get("helix_index_cached_run", {})
+    helix_first = results.get("helix_index_first_run", {})
+
+    comparisons = []
+    speedups = []
+    for param in all_params:
+        if param not in git_baseline:
+            continue
+
+        git_time = git_baseline[param]
+        cached_time = helix_cached.get(param)
+        comparisons.append((param, git_time, helix_first.get(param), cached_time))
+
+        if cached_time is not None and cached_time > 0:
+            speedups.append(git_time / cached_time)
+
+    return Prepared(
+        results=results,
+        all_params=all_params,
+        has_comparison=bool(git_baseline and helix_cached),
+        comparisons=comparisons,
+        speedups=speedups,
+        avg_query=_average(results.get("query_staged", {})),
+        avg_load=_average(results.get("helix_index_open", {})),
+    )
+
+
+def build_aligned_table(prepared: Prepared) -> str:
+    """Build results as a nicely aligned markdown table and return it as a string."""
+
+    results = prepared.results
+    all_params = prepared.all_params
+
+    # Prepare all rows, tracking column widths as cells are added
+    headers = ["Benchmark"] + [f"{p} files" for p in all_params]
+    col_widths = [len(h) for h in headers]
+
     rows = []
     for bench_name in sorted(results.keys()):
         bench_results = results[bench_name]
@@ -113,45 +222,32 @@ def build_aligned_table(results: Dict) -> str:
             else:
                 row_data.append("N/A")
 
-        rows.append(row_data)
-
-    # Calculate column widths
-    headers = ["Benchmark"] + [f"{p} files" for p in all_params]
-    col_widths = [len(h) for h in headers]
-
-    for row in rows:
-        for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(cell))
+        _append_row(rows, col_widths, row_data)
 
     lines = []
 
     # Header
-    header_line = (
-        "| " + " | ".join(h.ljust(w) for h, w in zip(headers, col_widths)) + " |"
-    )
+    header_fmt = _left_aligned_format(col_widths)
     separator = "|" + "|".join("-" * (w + 2) for w in col_widths) + "|"
 
-    lines.append(header_line)
+    lines.append(header_fmt.format(*headers))
     lines.append(separator)
 
-    # Rows
+    # Rows: benchmark name left-aligned, timings right-aligned
+    row_fmt = (
+        f"| {{:<{col_widths[0]}}} | "
+        + " | ".join(f"{{:>{w}}}" for w in col_widths[1:])
+        + " |"
+    )
     for row in rows:
-        row_line = (
-            "| "
-            + " | ".join(
-                cell.rjust(w) if i > 0 else cell.ljust(w)
-                for i, (cell, w) in enumerate(zip(row, col_widths))
-            )
-            + " |"
-        )
-        lines.append(row_line)
+        lines.append(row_fmt.format(*row))
 
     return "\n".join(lines)
 
 
 def print_aligned_table(results: Dict):
     """Print the aligned table (kept for backwards compatibility)."""
-    print(build_aligned_table(results))
+    print(build_aligned_table(prepare_results(results)))
 
 
 def calculate_speedup(git_time: float, helix_time: float) -> str:
@@ -167,110 +263,78 @@ def calculate_speedup(git_time: float, helix_time: float) -> str:
         return "same"
 
 
-def build_comparison_table(results: Dict) -> str:
+def build_comparison_table(prepared: Prepared) -> str:
     """Build comparison table between git and helix as markdown and return it."""
 
-    git_baseline = results.get("git_status_baseline", {})
-    helix_cached = results.get("helix_index_cached_run", {})
-    helix_first = results.get("helix_index_first_run", {})
-
-    if not git_baseline or not helix_cached:
+    if not prepared.has_comparison:
         return ""
 
     lines = []
     lines.append("## Performance Comparison\n")
 
-    all_params = sorted(git_baseline.keys(), key=lambda x: int(x) if x.isdigit() else 0)
+    # Prepare comparison rows, tracking column widths as cells are added
+    headers = ["Operation", "Time", "vs Git", ""]
+    col_widths = [len(h) for h in headers]
 
-    # Prepare comparison rows
     comparison_rows = []
 
-    for param in all_params:
-        if param not in git_baseline:
-            continue
-
-        git_time = git_baseline[param]
-
+    for param, git_time, first_time, cached_time in prepared.comparisons:
         # Git baseline
-        comparison_rows.append(
-            [f"Git status ({param} files)", format_time(git_time), "-", "-"]
+        _append_row(
+            comparison_rows,
+            col_widths,
+            [f"Git status ({param} files)", format_time(git_time), "-", "-"],
         )
 
         # Helix first run
-        if param in helix_first:
-            helix_time = helix_first[param]
-            speedup = calculate_speedup(git_time, helix_time)
-            comparison_rows.append(
-                [f"  Helix (first run)", format_time(helix_time), speedup, ""]
+        if first_time is not None:
+            speedup = calculate_speedup(git_time, first_time)
+            _append_row(
+                comparison_rows,
+                col_widths,
+                [f"  Helix (first run)", format_time(first_time), speedup, ""],
             )
 
         # Helix cached
-        if param in helix_cached:
-            helix_time = helix_cached[param]
-            speedup = calculate_speedup(git_time, helix_time)
-            comparison_rows.append(
-                [f"  Helix (cached)", format_time(helix_time), speedup, "⚡"]
+        if cached_time is not None:
+            speedup = calculate_speedup(git_time, cached_time)
+            _append_row(
+                comparison_rows,
+                col_widths,
+                [f"  Helix (cached)", format_time(cached_time), speedup, "⚡"],
             )
 
-        comparison_rows.append(["", "", "", ""])  # Blank row
-
-    # Calculate column widths
-    headers = ["Operation", "Time", "vs Git", ""]
-    col_widths = [len(h) for h in headers]
-
-    for row in comparison_rows:
-        for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(cell))
-
-    header_line = (
-        "| " + " | ".join(h.ljust(w) for h, w in zip(headers, col_widths)) + " |"
-    )
+    row_fmt = _left_aligned_format(col_widths)
     separator = "|" + "|".join("-" * (w + 2) for w in col_widths) + "|"
 
-    lines.append(header_line)
+    lines.append(row_fmt.format(*headers))
     lines.append(separator)
 
     # Rows
     for row in comparison_rows:
-        if all(cell == "" for cell in row):
-            continue
-        row_line = (
-            "| " + " | ".join(cell.ljust(w) for cell, w in zip(row, col_widths)) + " |"
-        )
-        lines.append(row_line)
+        lines.append(row_fmt.format(*row))
 
     return "\n".join(lines)
 
 
 def print_comparison_table(results: Dict):
     """Print comparison table (kept for backwards compatibility)."""
-    s = build_comparison_table(results)
+    s = build_comparison_table(prepare_results(results))
     if s:
         print(s)
 
 
-def build_summary_stats(results: Dict) -> str:
+def build_summary_stats(prepared: Prepared) -> str:
     """Build summary statistics as markdown and return it."""
 
-    git_baseline = results.get("git_status_baseline", {})
-    helix_cached = results.get("helix_index_cached_run", {})
-    query_staged = results.get("query_staged", {})
-
-    if not git_baseline or not helix_cached:
+    if not prepared.has_comparison:
         return ""
 
     lines = []
     lines.append("## Summary Statistics\n")
 
-    # Calculate average speedup
-    speedups = []
-    for param in git_baseline:
-        if param in helix_cached:
-            git_time = git_baseline[param]
-            helix_time = helix_cached[param]
-            if helix_time > 0:
-                speedups.append(git_time / helix_time)
-
+    # Average speedup
+    speedups = prepared.speedups
     if speedups:
         avg_speedup = sum(speedups) / len(speedups)
         lines.append(
@@ -278,31 +342,28 @@ def build_summary_stats(results: Dict) -> str:
         )
 
     # Query performance
-    if query_staged:
-        avg_query = sum(query_staged.values()) / len(query_staged)
-        lines.append(f"**Average query time:** {format_time(avg_query)}")
+    if prepared.avg_query is not None:
+        lines.append(f"**Average query time:** {format_time(prepared.avg_query)}")
 
     # Load time
-    helix_open = results.get("helix_index_open", {})
-    if helix_open:
-        avg_load = sum(helix_open.values()) / len(helix_open)
-        lines.append(f"**Average index load time:** {format_time(avg_load)}")
+    if prepared.avg_load is not None:
+        lines.append(f"**Average index load time:** {format_time(prepared.avg_load)}")
 
     return "\n".join(lines)
 
 
 def print_summary_stats(results: Dict):
     """Print summary stats (kept for backwards compatibility)."""
-    s = build_summary_stats(results)
+    s = build_summary_stats(prepare_results(results))
     if s:
         print(s)
 
 
 def main():
     # Find criterion directory
-    criterion_dir = Path("target/criterion")
+    criterion_dir = os.path.join("target", "criterion")
 
-    if not criterion_dir.exists():
+    if not os.path.exists(criterion_dir):
         print(
             "Error: No criterion results found. Run 'cargo bench' first.",
             file=sys.stderr,
@@ -316,52 +377,51 @@ def main():
         print("Error: No benchmark results found.", file=sys.stderr)
         sys.exit(1)
 
+    prepared = prepare_results(results)
+
     # Build sections
     title = "# Helix Benchmark Results\n"
-    aligned_section = "## All Operations\n\n" + build_aligned_table(results)
-    comparison_section = build_comparison_table(results)
-    summary_section = build_summary_stats(results)
-
-    # Print to stdout (keep existing behavior)
-    print(title)
-    print(aligned_section)
-    if comparison_section:
-        print()
-        print(comparison_section)
-    if summary_section:
-        print()
-        print(summary_section)
+    aligned_section = "## All Operations\n\n" + build_aligned_table(prepared)
+    comparison_section = build_comparison_table(prepared)
+    summary_section = build_summary_stats(prepared)
 
     today_str = date.today().isoformat()
     script_dir = Path(__file__).resolve().parent
     archive_dir = script_dir.parent / "benches" / "archive"
     archive_dir.mkdir(parents=True, exist_ok=True)
 
-    # Find existing archives for today
-    existing = sorted(archive_dir.glob(f"{today_str}-*.md"))
+    # Find the highest counter among today's archives and increment it
+    prefix = f"{today_str}-"
+    last_counter = 0
+    with os.scandir(archive_dir) as it:
+        for entry in it:
+            name = entry.name
+            if not (name.startswith(prefix) and name.endswith(".md")):
+                continue
+            counter = name[len(prefix) : -len(".md")]
+            if counter.isdigit():
+                last_counter = max(last_counter, int(counter))
 
-    if existing:
-        # Extract last counter and increment
-        last_file = existing[-1]
-        last_counter = int(last_file.stem.split("-")[-1])
-        next_counter = last_counter + 1
-    else:
-        next_counter = 1
+    next_counter = last_counter + 1
 
     archive_path = archive_dir / f"{today_str}-{next_counter:03d}.md"
 
-    full_md = [title, aligned_section]
+    full_md = [title.encode("utf-8"), aligned_section.encode("utf-8")]
     if comparison_section:
-        full_md.append("\n" + comparison_section)
+        full_md.append(b"\n" + comparison_section.encode("utf-8"))
     if summary_section:
-        full_md.append("\n" + summary_section)
+        full_md.append(b"\n" + summary_section.encode("utf-8"))
 
-    archive_content = "\n\n".join(full_md).rstrip() + "\n"
+    archive_content = b"\n\n".join(full_md).rstrip() + b"\n"
 
-    with open(archive_path, "w", encoding="utf-8") as f:
+    with open(archive_path, "wb") as f:
         f.write(archive_content)
 
-    print(f"\nWrote archive to {archive_path}")
+    # Echo the archive to stdout byte-for-byte, flushing once at the end
+    out = sys.stdout.buffer
+    out.write(archive_content)
+    out.write(f"\nWrote archive to {archive_path}\n".encode("utf-8"))
+    out.flush()
 
 
 if __name__ == "__main__":